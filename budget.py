@@ -0,0 +1,194 @@
+import heapq
+import logging
+import os
+import time
+from itertools import islice
+
+from constants import MAX_ENEMIES, MAX_PROJECTILES, MEMORY_CEILING_MB, FPS_FLOOR, MIN_BUDGET_CAP, \
+    BUDGET_CHECK_INTERVAL, MERGE_GROUP_SIZE, DISTANT_RADIUS, BUDGET_LOG_INTERVAL, MEMORY_GROWTH_MB
+
+logger = logging.getLogger(__name__)
+
+# Policy counters, in the order they are logged and streamed
+BUDGET_COUNTERS = ('merge_enemies', 'drop_projectiles', 'throttle_distant', 'lower_caps', 'memory_ceiling')
+
+
+def current_memory_bytes():
+    # Resident set size from /proc (Linux); None where it is not available
+    try:
+        with open('/proc/self/statm') as statm:
+            return int(statm.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError, IndexError):
+        return None
+
+
+class BudgetManager:
+    # Bounds entity counts and per-frame work, degrading gracefully instead of growing forever
+    def __init__(self, max_enemies=MAX_ENEMIES, max_projectiles=MAX_PROJECTILES,
+                 memory_ceiling_mb=MEMORY_CEILING_MB, fps_floor=FPS_FLOOR):
+        if min(max_enemies, max_projectiles, memory_ceiling_mb, fps_floor) <= 0:
+            raise ValueError("Budget caps, memory ceiling and FPS floor must be positive")
+        self.max_enemies = max_enemies
+        self.max_projectiles = max_projectiles
+        self.memory_ceiling = memory_ceiling_mb * 1024 * 1024
+        self.fps_floor = fps_floor
+
+        # Effective caps, lowered under memory or frame-rate pressure and restored when healthy
+        self.enemy_cap = max_enemies
+        self.projectile_cap = max_projectiles
+        self.throttle_distant = False
+
+        self.frames_until_check = BUDGET_CHECK_INTERVAL
+        self.last_frame_time = None
+        self.frame_time = 0.0  # Smoothed seconds per frame
+        self.last_memory = None  # Memory at the previous check
+
+        # How often each policy fired, all counted as events:
+        # merge_enemies, drop_projectiles, throttle_distant: frames in which the policy acted
+        # lower_caps: checks that lowered the caps (frame rate or memory)
+        # memory_ceiling: checks that found memory above the ceiling
+        self.counters = {name: 0 for name in BUDGET_COUNTERS}
+        self.fired_this_frame = set()
+        self.checks_until_log = BUDGET_LOG_INTERVAL
+        self.logged_counters = dict(self.counters)
+
+    def reset_clock(self):
+        # Called while the game is paused so the pause is not counted as a slow frame
+        self.last_frame_time = None
+
+    def begin_frame(self, enemies, players):
+        now = time.perf_counter()
+        if self.last_frame_time is not None:
+            self.frame_time += (now - self.last_frame_time - self.frame_time) * 0.1
+        self.last_frame_time = now
+        self.fired_this_frame.clear()
+
+        self.frames_until_check -= 1
+        if self.frames_until_check <= 0:
+            self.frames_until_check = BUDGET_CHECK_INTERVAL
+            self.check_pressure(enemies, players)
+
+    def check_pressure(self, enemies, players):
+        too_slow = self.frame_time > 1 / self.fps_floor
+        memory = current_memory_bytes()
+        over_memory = memory is not None and memory > self.memory_ceiling
+        if over_memory:
+            self.counters['memory_ceiling'] += 1
+
+        # Smaller caps do not make the process give memory back, so above the ceiling they are
+        # only lowered while memory is still growing; otherwise the hit is just counted
+        memory_growing = (over_memory and self.last_memory is not None
+                          and memory - self.last_memory > MEMORY_GROWTH_MB * 1024 * 1024)
+        self.last_memory = memory
+
+        # Lowering caps only helps while it would actually remove entities
+        can_shrink = self.can_shrink(enemies, players)
+
+        if too_slow and not self.throttle_distant:
+            # Cheapest policy first: update far away enemies less often
+            self.throttle_distant = True
+        elif (too_slow or memory_growing) and can_shrink:
+            self.lower_caps()
+        elif not too_slow:
+            # Healthy, or smaller caps would not help: recover towards the configured caps
+            self.enemy_cap = min(self.max_enemies, self.enemy_cap + max(1, self.max_enemies // 10))
+            self.projectile_cap = min(self.max_projectiles, self.projectile_cap + max(1, self.max_projectiles // 10))
+            if self.frame_time < 0.9 / self.fps_floor:
+                self.throttle_distant = False
+
+        self.checks_until_log -= 1
+        if self.checks_until_log <= 0:
+            self.checks_until_log = BUDGET_LOG_INTERVAL
+            self.log_counters()
+
+    def fire(self, policy):
+        # Count a per-frame policy at most once per frame
+        if policy not in self.fired_this_frame:
+            self.fired_this_frame.add(policy)
+            self.counters[policy] += 1
+
+    def enemy_floor(self):
+        return min(MIN_BUDGET_CAP, self.max_enemies)
+
+    def projectile_floor(self):
+        return min(MIN_BUDGET_CAP, self.max_projectiles)
+
+    def can_shrink(self, enemies, players):
+        # True if lowering the caps would remove enemies (by merging) or projectiles
+        mergeable = sum(1 for e in enemies if not e.elite) >= 2
+        enemy_cap = max(self.enemy_floor(), int(self.enemy_cap * 0.9))
+        if mergeable and len(enemies) > enemy_cap:
+            return True
+        projectiles = sum(len(weapon.projectiles) for player in players for weapon in player.weapons)
+        return projectiles > max(self.projectile_floor(), int(self.projectile_cap * 0.9))
+
+    def log_counters(self):
+        # Periodic report for unattended sessions, only when a policy fired since the last one
+        if self.counters == self.logged_counters:
+            return
+        self.logged_counters = dict(self.counters)
+        logger.info("Budget: %s, enemy cap %d, projectile cap %d",
+                    ", ".join(f"{name}={self.counters[name]}" for name in BUDGET_COUNTERS),
+                    self.enemy_cap, self.projectile_cap)
+
+    def lower_caps(self):
+        # Never shrink below the floor, and never raise a cap configured below it
+        self.enemy_cap = max(self.enemy_floor(), int(self.enemy_cap * 0.9))
+        self.projectile_cap = max(self.projectile_floor(), int(self.projectile_cap * 0.9))
+        self.counters['lower_caps'] += 1
+
+    def update_steps(self, enemy, target_dist_sq, frame):
+        # How many steps an enemy moves this frame: distant ones move double every other frame
+        if not self.throttle_distant:
+            return 1
+        if target_dist_sq < DISTANT_RADIUS * DISTANT_RADIUS:
+            return 1
+        if (enemy.id + frame) % 2:
+            self.fire('throttle_distant')
+            return 0
+        return 2
+
+    def make_room_for_enemy(self, enemies):
+        # Returns True if another enemy may be spawned, merging weak ones if needed.
+        # When nothing is left to merge the spawn is skipped instead.
+        if len(enemies) >= self.enemy_cap:
+            self.merge_weak_enemies(enemies)
+        return len(enemies) < self.enemy_cap
+
+    def merge_weak_enemies(self, enemies):
+        # Fold the weakest regular enemies into the toughest of them. Elites are never merged
+        # again, so an elite is worth at most MERGE_GROUP_SIZE regular enemies.
+        group = heapq.nsmallest(MERGE_GROUP_SIZE, (e for e in enemies if not e.elite), key=lambda e: e.health)
+        if len(group) < 2:
+            return False
+        elite = max(group, key=lambda e: e.max_health)
+        for enemy in group:
+            if enemy is not elite:
+                elite.absorb(enemy)
+                enemies.remove(enemy)
+        self.fire('merge_enemies')
+        return True
+
+    def enforce(self, enemies, players):
+        # Bring entity counts back under the current caps
+        while len(enemies) > self.enemy_cap:
+            if not self.merge_weak_enemies(enemies):
+                break
+
+        weapons = [weapon for player in players for weapon in player.weapons]
+        excess = sum(len(weapon.projectiles) for weapon in weapons) - self.projectile_cap
+        if excess > 0:
+            self.drop_oldest_projectiles(weapons, excess)
+
+    def drop_oldest_projectiles(self, weapons, count):
+        # Each weapon's list is already oldest-first (ids increase), so the oldest overall
+        # are a prefix of every list
+        oldest = islice(heapq.merge(*[[(p['id'], i) for p in weapon.projectiles] for i, weapon in enumerate(weapons)]),
+                        count)
+        dropped = [0] * len(weapons)
+        for _, i in oldest:
+            dropped[i] += 1
+        for weapon, n in zip(weapons, dropped):
+            if n:
+                del weapon.projectiles[:n]
+        self.fire('drop_projectiles')
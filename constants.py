@@ -19,6 +19,9 @@ GREEN = (0, 255, 0)
 BLUE = (0, 100, 255)
 PURPLE = (128, 0, 128)
 GOLD = (255, 215, 0)
+CYAN = (0, 255, 255)
+ORANGE = (255, 140, 0)
+PINK = (255, 105, 180)
 
 # Weapon types enum
 class WeaponType(Enum):
@@ -27,4 +30,38 @@ class WeaponType(Enum):
     MAGIC = 3
 
 # Player parameters
-XP_TO_LEVEL = 100
\ No newline at end of file
+XP_TO_LEVEL = 100
+
+# Local co-op
+MIN_PLAYERS = 1
+MAX_PLAYERS = 4
+PLAYER_COLORS = [WHITE, CYAN, ORANGE, PINK]
+GAMEPAD_DEADZONE = 0.25
+
+# Budget (long unattended sessions)
+MAX_PROJECTILES = 300  # Across all players and weapons
+MEMORY_CEILING_MB = 512
+MEMORY_GROWTH_MB = 1  # Growth between checks that counts as memory still rising
+FPS_FLOOR = 45
+MIN_BUDGET_CAP = 10  # Caps never shrink below this under pressure
+BUDGET_CHECK_INTERVAL = FPS  # Frames between frame-rate / memory checks
+BUDGET_LOG_INTERVAL = 60  # Checks between budget counter log lines (about a minute)
+MERGE_GROUP_SIZE = 3  # Weak enemies folded into one elite when the enemy cap is hit
+DISTANT_RADIUS = 350  # Enemies farther than this from their target may update every other frame
+
+# Spectator streaming
+STREAM_HOST = "127.0.0.1"
+STREAM_PORT = 50007
+SNAPSHOT_HISTORY = 120  # Snapshots kept as possible delta baselines (2 seconds)
+MAX_PENDING_BYTES = 1 << 20  # Skip ticks for a viewer that falls this far behind
+ENEMY_REFRESH_INTERVAL = 4  # Each enemy's streamed row is refreshed every this many ticks (staggered)
+
+# Upgrade parameters
+MAX_WEAPON_LEVEL = 8
+MAX_SPEED_LEVEL = 5
+UPGRADE_CHOICES = 3
+
+# Upgrade rarities: (display name, color)
+RARITY_COMMON = ("Common", WHITE)
+RARITY_RARE = ("Rare", BLUE)
+RARITY_EPIC = ("Epic", GOLD)
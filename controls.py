@@ -0,0 +1,86 @@
+import pygame
+from constants import GAMEPAD_DEADZONE
+
+# Keyboard layouts per player slot. 'choices' pick upgrade options and switch weapons.
+KEYBOARD_MAPPINGS = [
+    {'up': [pygame.K_w], 'down': [pygame.K_s], 'left': [pygame.K_a], 'right': [pygame.K_d],
+     'choices': [pygame.K_1, pygame.K_2, pygame.K_3]},
+    {'up': [pygame.K_UP], 'down': [pygame.K_DOWN], 'left': [pygame.K_LEFT], 'right': [pygame.K_RIGHT],
+     'choices': [pygame.K_COMMA, pygame.K_PERIOD, pygame.K_SLASH]},
+    {'up': [pygame.K_i], 'down': [pygame.K_k], 'left': [pygame.K_j], 'right': [pygame.K_l],
+     'choices': [pygame.K_7, pygame.K_8, pygame.K_9]},
+    {'up': [pygame.K_KP8], 'down': [pygame.K_KP5], 'left': [pygame.K_KP4], 'right': [pygame.K_KP6],
+     'choices': [pygame.K_KP1, pygame.K_KP2, pygame.K_KP3]},
+]
+
+# Solo play keeps both WASD and the arrow keys
+SOLO_MAPPING = {
+    'up': [pygame.K_w, pygame.K_UP], 'down': [pygame.K_s, pygame.K_DOWN],
+    'left': [pygame.K_a, pygame.K_LEFT], 'right': [pygame.K_d, pygame.K_RIGHT],
+    'choices': [pygame.K_1, pygame.K_2, pygame.K_3],
+}
+
+# Gamepad buttons that pick upgrade options / switch weapons
+GAMEPAD_CHOICE_BUTTONS = [0, 1, 2]
+
+
+class PlayerControls:
+    def __init__(self, mapping, joystick=None):
+        self.mapping = mapping
+        self.joystick = joystick
+        self.joystick_id = joystick.get_instance_id() if joystick is not None else None
+        # Labels for the upgrade menu, built once
+        labels = [pygame.key.name(key) for key in mapping['choices']]
+        if joystick is not None:
+            labels = [f"{label}/B{button}" for label, button in zip(labels, GAMEPAD_CHOICE_BUTTONS)]
+        self.choice_labels = labels
+
+    def movement(self, keys):
+        # Returns (dx, dy), each in [-1, 1]
+        dx = 0
+        dy = 0
+        if any(keys[k] for k in self.mapping['up']):
+            dy -= 1
+        if any(keys[k] for k in self.mapping['down']):
+            dy += 1
+        if any(keys[k] for k in self.mapping['left']):
+            dx -= 1
+        if any(keys[k] for k in self.mapping['right']):
+            dx += 1
+
+        if self.joystick is not None:
+            axis_x = self.joystick.get_axis(0)
+            axis_y = self.joystick.get_axis(1)
+            if abs(axis_x) > GAMEPAD_DEADZONE:
+                dx += axis_x
+            if abs(axis_y) > GAMEPAD_DEADZONE:
+                dy += axis_y
+            if self.joystick.get_numhats() > 0:
+                hat_x, hat_y = self.joystick.get_hat(0)
+                dx += hat_x
+                dy -= hat_y
+
+        return max(-1, min(1, dx)), max(-1, min(1, dy))
+
+    def choice_for_event(self, event):
+        # Returns the 0-based choice index this event selects for this player, or None
+        if event.type == pygame.KEYDOWN and event.key in self.mapping['choices']:
+            return self.mapping['choices'].index(event.key)
+        if (event.type == pygame.JOYBUTTONDOWN and self.joystick is not None
+                and event.instance_id == self.joystick_id and event.button in GAMEPAD_CHOICE_BUTTONS):
+            return GAMEPAD_CHOICE_BUTTONS.index(event.button)
+        return None
+
+
+def build_player_controls(num_players, joysticks=()):
+    # Player N uses keyboard layout N plus gamepad N if one is connected
+    if num_players == 1:
+        mappings = [SOLO_MAPPING]
+    else:
+        mappings = KEYBOARD_MAPPINGS[:num_players]
+
+    controls = []
+    for i, mapping in enumerate(mappings):
+        joystick = joysticks[i] if i < len(joysticks) else None
+        controls.append(PlayerControls(mapping, joystick))
+    return controls
@@ -1,10 +1,22 @@
+import itertools
 import pygame
 import random
 import math
-from constants import SCREEN_WIDTH, SCREEN_HEIGHT, RED, BLUE, PURPLE, GREEN
+from constants import SCREEN_WIDTH, SCREEN_HEIGHT, RED, BLUE, PURPLE, GREEN, GOLD
+
+ELITE_MAX_SIZE = 40
+
+ENEMY_TYPES = ['basic', 'fast', 'tank']
+ENEMY_TYPE_WEIGHTS = [0.7, 0.2, 0.1]  # Default weights
+
+# Stable ids so enemies can be tracked across frames (e.g. for network snapshots)
+_enemy_ids = itertools.count(1)
+
 
 class Enemy:
     def __init__(self, player_x, player_y, enemy_type=None):
+        self.id = next(_enemy_ids)
+
         # Randomize spawn location outside the screen but not too far
         side = random.randint(0, 3)  # 0: top, 1: right, 2: bottom, 3: left
 
@@ -24,9 +36,7 @@ class Enemy:
         # Enemy type (if not specified, choose randomly with weights)
         if enemy_type is None:
             # As player progresses, different enemies have different spawn chances
-            enemy_types = ['basic', 'fast', 'tank']
-            weights = [0.7, 0.2, 0.1]  # Default weights
-            enemy_type = random.choices(enemy_types, weights=weights)[0]
+            enemy_type = random.choices(ENEMY_TYPES, weights=ENEMY_TYPE_WEIGHTS)[0]
 
         self.type = enemy_type
 
@@ -59,18 +69,36 @@ class Enemy:
         # 10% chance to drop a gem
         self.drops_gem = random.random() < 0.1
 
-    def update(self, player_x, player_y):
-        # Move towards player
+        # Player credited with the kill
+        self.last_hit_by = None
+
+        # Elites are several weak enemies merged into one (see BudgetManager)
+        self.elite = False
+
+    def update(self, player_x, player_y, steps=1):
+        # Move towards player (steps > 1 catches up on skipped updates)
         dx = player_x - self.x
         dy = player_y - self.y
         dist = max(0.1, math.sqrt(dx * dx + dy * dy))  # Avoid division by zero
 
-        self.x += (dx / dist) * self.speed
-        self.y += (dy / dist) * self.speed
+        self.x += (dx / dist) * self.speed * steps
+        self.y += (dy / dist) * self.speed * steps
+
+    def absorb(self, other):
+        # Take over another enemy's health and rewards, becoming an elite
+        self.health += other.health
+        self.max_health += other.max_health
+        self.xp_value += other.xp_value
+        self.damage = max(self.damage, other.damage)
+        self.drops_gem = self.drops_gem or other.drops_gem
+        self.size = min(self.size + other.size // 3, ELITE_MAX_SIZE)
+        self.elite = True
 
     def draw(self, screen):
         # Draw enemy
         pygame.draw.circle(screen, self.color, (int(self.x), int(self.y)), self.size)
+        if self.elite:
+            pygame.draw.circle(screen, GOLD, (int(self.x), int(self.y)), self.size, 2)
 
         # Draw health bar for bigger enemies
         if self.size >= 15:
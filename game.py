@@ -1,123 +1,130 @@
-import random
-
 import pygame
 
-from constants import FPS, WeaponType, MIN_ENEMIES, ENEMY_SPAWN_RATE, BLACK
+from constants import FPS, MIN_ENEMIES, ENEMY_SPAWN_RATE, BLACK, SCREEN_WIDTH, SCREEN_HEIGHT, MIN_PLAYERS, \
+    MAX_PLAYERS
+from budget import BudgetManager
+from controls import build_player_controls
 from enemy import Enemy
 from player import Player
 from ui import UI
-from weapon import Weapon
+from upgrades import roll_upgrade_options
 
 
 class Game:
 
-    def __init__(self):
-        self.player = Player()
+    def __init__(self, num_players=1, joysticks=(), budget=None):
+        num_players = max(MIN_PLAYERS, min(MAX_PLAYERS, num_players))
+        self.players = [
+            Player(i, controls, num_players)
+            for i, controls in enumerate(build_player_controls(num_players, joysticks))
+        ]
+        self.budget = budget if budget is not None else BudgetManager()
+        self.budget.reset_clock()
         self.enemies = []
         self.enemy_spawn_timer = 0
         self.game_over = False
         self.paused = False
         self.show_upgrade_menu = False
+        self.upgrade_player = None  # Player currently choosing an upgrade
         self.upgrade_options = []
+        self.next_upgrade_index = 0  # Round-robin start between player upgrade queues
         self.time = 0  # Game time in frames
         self.difficulty_level = 1
         self.next_difficulty_time = 30 * FPS  # 30 seconds for first difficulty increase
         self.ui = UI(self)
 
     def generate_upgrade_options(self):
-        if len(self.upgrade_options) > 0:
-            return
-        options = []
-
-        # Option 1: New weapon if < 3 weapons, otherwise upgrade random weapon
-        if len(self.player.weapons) < 3:
-            # Get weapons the player doesn't have yet
-            current_weapon_types = [w.type for w in self.player.weapons]
-            new_weapon_options = [w for w in list(WeaponType) if w not in current_weapon_types]
-
-            if new_weapon_options:
-                weapon_type = random.choice(new_weapon_options)
-                options.append({
-                    'type': 'new_weapon',
-                    'weapon_type': weapon_type,
-                    'name': f"New Weapon: {weapon_type.name}",
-                    'description': f"Add a new {weapon_type.name.lower()} weapon to your arsenal."
-                })
-
-        # Option 2-3: Upgrade existing weapons
-        for weapon in self.player.weapons:
-            options.append({
-                'type': 'upgrade_weapon',
-                'weapon': weapon,
-                'name': f"Upgrade {weapon.type.name}",
-                'description': f"Increase damage, penetration and reduce cooldown of your {weapon.type.name.lower()}."
-            })
-
-        # Option 4: Health upgrade
-        options.append({
-            'type': 'health_upgrade',
-            'name': "Health Boost",
-            'description': "Increase max health by 25 and fully heal."
-        })
-
-        # Option 5: Speed upgrade
-        options.append({
-            'type': 'speed_upgrade',
-            'name': "Movement Speed",
-            'description': "Increase movement speed by 15%."
-        })
-
-        # Randomly select 3 different options
-        if len(options) > 3:
-            options =  random.sample(options, 3)
-        self.upgrade_options = options
-        return options
-
-    def apply_upgrade(self, option):
-        if option['type'] == 'new_weapon':
-            self.player.weapons.append(Weapon(option['weapon_type']))
-
-        elif option['type'] == 'upgrade_weapon':
-            weapon = option['weapon']
-            weapon.level += 1
-            weapon.apply_level_bonuses()
+        # Serve the next queued level-up, taking turns between players.
+        # Options are rolled once per level-up event; the menu only displays the result.
+        self.upgrade_player = None
+        self.upgrade_options = []
+        self.show_upgrade_menu = False
 
-        elif option['type'] == 'health_upgrade':
-            self.player.max_health += 25
-            self.player.health = self.player.max_health
+        for offset in range(len(self.players)):
+            player = self.players[(self.next_upgrade_index + offset) % len(self.players)]
+            if not player.alive:
+                player.upgrade_queue.clear()
+                continue
+            while player.upgrade_queue:
+                player.upgrade_queue.popleft()
+                options = roll_upgrade_options(player)
+                if options:
+                    self.upgrade_player = player
+                    self.upgrade_options = options
+                    self.show_upgrade_menu = True
+                    self.next_upgrade_index = (player.index + 1) % len(self.players)
+                    return options
+        return []
+
+    def nearest_player(self, x, y):
+        # Nearest living player, or the first player if everyone is down
+        alive_players = [player for player in self.players if player.alive] or self.players
+        return min(alive_players, key=lambda p: (p.x - x) ** 2 + (p.y - y) ** 2)
 
-        elif option['type'] == 'speed_upgrade':
-            self.player.speed *= 1.15
+    def apply_upgrade(self, option):
+        option.apply(self.upgrade_player)
+        self.generate_upgrade_options()
 
     def update(self):
         if self.game_over or self.paused or self.show_upgrade_menu:
+            self.budget.reset_clock()
             return
 
+        self.budget.begin_frame(self.enemies, self.players)
+
         # Get keyboard input
         keys = pygame.key.get_pressed()
 
-        # Update player
-        self.player.update(keys, self.enemies)
-
-        # Update enemies
-        for enemy in self.enemies[:]:
-            enemy.update(self.player.x, self.player.y)
+        # Update players
+        for player in self.players:
+            if player.alive:
+                player.update(keys, self.enemies)
 
-            # Check collision with player
-            if enemy.check_collision(self.player):
-                if self.player.take_damage(enemy.damage):
-                    self.game_over = True
+        # Update enemies. One pass over the living players (at most 4) finds the exact
+        # nearest one to home in on and handles collisions at the enemy's current position.
+        alive_players = [player for player in self.players if player.alive]
+        for enemy in self.enemies:
+            target = None
+            target_dist = float('inf')
+            for player in alive_players:
+                dx = player.x - enemy.x
+                dy = player.y - enemy.y
+                dist = dx * dx + dy * dy
+                reach = enemy.size + player.size
+                if dist < reach * reach:
+                    player.take_damage(enemy.damage)
+                if dist < target_dist:
+                    target_dist = dist
+                    target = player
+
+            if target is None:
+                continue
+            steps = self.budget.update_steps(enemy, target_dist, self.time)
+            if steps == 0:
+                continue  # Distant enemy skipped this frame under load
+            enemy.update(target.x, target.y, steps)
+
+        if not any(player.alive for player in self.players):
+            self.game_over = True
 
         # Check for dead enemies and remove them
         for enemy in self.enemies[:]:
             if enemy.health <= 0:
-                self.show_upgrade_menu = self.player.add_xp(enemy.xp_value)
-                self.player.kills += 1
+                # Credit the player who landed the last hit
+                player = enemy.last_hit_by
+                if player is None or not player.alive:
+                    player = self.nearest_player(enemy.x, enemy.y)
+                if player.add_xp(enemy.xp_value):
+                    player.upgrade_queue.append(player.level)
+                player.kills += 1
                 if enemy.drops_gem:
-                    self.player.add_gem()
+                    player.add_gem()
 
                 self.enemies.remove(enemy)
 
+        if not self.show_upgrade_menu:
+            self.generate_upgrade_options()
+
         # Spawn enemies
         self.enemy_spawn_timer += 1
 
@@ -125,9 +132,13 @@ class Game:
         max_enemies = max(MIN_ENEMIES, 10 + self.difficulty_level * 5)
 
         if self.enemy_spawn_timer >= spawn_rate and len(self.enemies) < max_enemies:
-            self.enemies.append(Enemy(self.player.x, self.player.y))
+            if self.budget.make_room_for_enemy(self.enemies):
+                self.enemies.append(Enemy(SCREEN_WIDTH // 2, SCREEN_HEIGHT // 2))
             self.enemy_spawn_timer = 0
 
+        # Keep entity counts within budget
+        self.budget.enforce(self.enemies, self.players)
+
         # Increase difficulty over time
         self.time += 1
         if self.time >= self.next_difficulty_time:
@@ -142,8 +153,10 @@ class Game:
         for enemy in self.enemies:
             enemy.draw(screen)
 
-        # Draw player
-        self.player.draw(screen)
+        # Draw players
+        for player in self.players:
+            if player.alive:
+                player.draw(screen)
 
         # Draw UI
         self.ui.draw_ui(screen)
@@ -154,10 +167,7 @@ class Game:
 
         # Draw upgrade menu
         if self.show_upgrade_menu:
-            self.generate_upgrade_options()
             self.ui.draw_upgrade_menu(screen)
-        #     self.generate_upgrade_options()
-        #     self.apply_upgrade()
         # Update display
         pygame.display.flip()
 
@@ -1,6 +1,12 @@
+import argparse
+import logging
+
 import pygame
-from constants import SCREEN_WIDTH, SCREEN_HEIGHT, FPS
+from budget import BudgetManager
+from constants import SCREEN_WIDTH, SCREEN_HEIGHT, FPS, MIN_PLAYERS, MAX_PLAYERS, STREAM_HOST, STREAM_PORT, \
+    MAX_ENEMIES, MAX_PROJECTILES, MEMORY_CEILING_MB, FPS_FLOOR
 from game import Game
+from network import SnapshotServer, SnapshotClient, SpectatorView
 # Initialize pygame
 # from ui import UI
 
@@ -11,8 +17,14 @@ screen = pygame.display.set_mode((SCREEN_WIDTH, SCREEN_HEIGHT))
 pygame.display.set_caption("Vampire Survivors Clone")
 clock = pygame.time.Clock()
 
-def main():
-    game = Game()
+def main(num_players=1, server=None, budget=None):
+    # Every connected gamepad is offered to the player slot with the same index
+    pygame.joystick.init()
+    joysticks = [pygame.joystick.Joystick(i) for i in range(pygame.joystick.get_count())]
+
+    # One budget for the whole session so its counters survive restarts
+    budget = budget if budget is not None else BudgetManager()
+    game = Game(num_players, joysticks, budget)
     # ui = UI(game)
     # game.ui = ui
     running = True
@@ -23,51 +35,109 @@ def main():
             if event.type == pygame.QUIT:
                 running = False
 
+            # Upgrade menu controls (only the player who leveled up can choose)
+            if game.show_upgrade_menu and not game.game_over:
+                option_index = game.upgrade_player.controls.choice_for_event(event)
+                if option_index is not None and option_index < len(game.upgrade_options):
+                    game.apply_upgrade(game.upgrade_options[option_index])
+                continue
+
             if event.type == pygame.KEYDOWN:
                 # Game over controls
                 if game.game_over:
                     if event.key == pygame.K_r:
-                        game = Game()  # Restart
+                        game = Game(num_players, joysticks, budget)  # Restart
                     elif event.key == pygame.K_ESCAPE:
                         running = False  # Quit
-
-                # Upgrade menu controls
-                elif game.show_upgrade_menu:
-                    if event.key in [pygame.K_1, pygame.K_2, pygame.K_3] and len(
-                            game.upgrade_options) >= event.key - pygame.K_0:
-                        option_index = event.key - pygame.K_1
-                        if 0 <= option_index < len(game.upgrade_options):
-                            game.apply_upgrade(game.upgrade_options[option_index])
-                            game.upgrade_options = []
-                            game.show_upgrade_menu = False
+                    continue
 
                 # Pause control
                 elif event.key == pygame.K_p or event.key == pygame.K_ESCAPE:
                     game.paused = not game.paused
+                    continue
 
-                elif event.key in [pygame.K_1, pygame.K_2, pygame.K_3]:
-                    if event.key == pygame.K_1:
-                        game.player.change_weapon(1)
-                    elif event.key == pygame.K_2:
-                        game.player.change_weapon(2)
-                    elif event.key == pygame.K_3:
-                        game.player.change_weapon(3)
-
-                elif event.key == pygame.K_l and game.paused:
-                    game.player.level += 1
+                elif event.key == pygame.K_F1 and game.paused:
+                    game.players[0].level += 1
+                    continue
 
+            # Weapon switching with each player's choice keys / buttons
+            for player in game.players:
+                weapon_index = player.controls.choice_for_event(event)
+                if weapon_index is not None:
+                    player.change_weapon(weapon_index + 1)
 
         # Update game state
         game.update()
 
+        # Stream the new state to spectators
+        if server is not None:
+            server.publish(game)
+
         # Draw everything
         game.draw(screen)
 
         # Cap the frame rate
         clock.tick(FPS)
 
+    if server is not None:
+        server.close()
+    pygame.quit()
+
+
+def watch(host, port):
+    # Thin spectator: renders a streamed run with the regular draw code
+    client = SnapshotClient(host, port)
+    view = SpectatorView()
+    running = True
+
+    while running and client.connected:
+        for event in pygame.event.get():
+            if event.type == pygame.QUIT:
+                running = False
+            elif event.type == pygame.KEYDOWN and event.key == pygame.K_ESCAPE:
+                running = False
+
+        snapshot = client.poll()
+        if snapshot is not None:
+            view.apply(snapshot)
+
+        if view.game is not None:
+            view.game.draw(screen)
+
+        clock.tick(FPS)
+
+    client.close()
     pygame.quit()
 
 
+def positive_int(value):
+    number = int(value)
+    if number <= 0:
+        raise argparse.ArgumentTypeError(f"{value} is not a positive integer")
+    return number
+
+
 if __name__ == "__main__":
-    main()
+    parser = argparse.ArgumentParser(description="Vampire Survivors Clone")
+    parser.add_argument("--players", type=int, default=1, choices=range(MIN_PLAYERS, MAX_PLAYERS + 1),
+                        help="number of local co-op players")
+    parser.add_argument("--max-enemies", type=positive_int, default=MAX_ENEMIES, help="enemy cap before merging into elites")
+    parser.add_argument("--max-projectiles", type=positive_int, default=MAX_PROJECTILES,
+                        help="projectile cap before dropping the oldest")
+    parser.add_argument("--memory-ceiling", type=positive_int, default=MEMORY_CEILING_MB, metavar="MB",
+                        help="memory above which caps are lowered")
+    parser.add_argument("--fps-floor", type=positive_int, default=FPS_FLOOR, help="frame rate below which work is shed")
+    parser.add_argument("--serve", action="store_true", help="stream the run to spectators")
+    parser.add_argument("--watch", metavar="HOST", help="spectate a run streamed from HOST")
+    parser.add_argument("--bind", default=STREAM_HOST, help="address to stream on with --serve")
+    parser.add_argument("--port", type=int, default=STREAM_PORT, help="stream port")
+    args = parser.parse_args()
+
+    # Budget counters are reported through logging on unattended sessions
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(name)s: %(message)s")
+
+    if args.watch:
+        watch(args.watch, args.port)
+    else:
+        budget = BudgetManager(args.max_enemies, args.max_projectiles, args.memory_ceiling, args.fps_floor)
+        main(args.players, SnapshotServer(args.bind, args.port) if args.serve else None, budget)
@@ -0,0 +1,473 @@
+import json
+import os
+import socket
+import struct
+import sys
+import time
+import zlib
+from array import array
+from operator import sub
+
+import pygame
+
+from budget import BUDGET_COUNTERS
+from constants import WeaponType, STREAM_HOST, STREAM_PORT, SNAPSHOT_HISTORY, MAX_PENDING_BYTES, \
+    ENEMY_REFRESH_INTERVAL
+from enemy import Enemy, ENEMY_TYPES
+from game import Game
+from weapon import Weapon
+
+# Wire format
+# frame:   <u32 length> <zlib body>
+# body:    <u32 seq> <u32 baseline seq> then per table: <u32 removed> <u32 full> <u32 delta> <i32 values...>,
+#          then <i32 meta length> <json meta> (length -1 means unchanged from the baseline)
+# ack:     <u32 seq> sent by the viewer for every snapshot it applied
+# Entity values are quantized to ints; "full" records are (id, values...), "delta" records are
+# (id, value - baseline value...) so small movements compress to almost nothing.
+FRAME = struct.Struct('<I')
+HEADER = struct.Struct('<II')
+COUNTS = struct.Struct('<III')
+META_LENGTH = struct.Struct('<i')
+ACK = struct.Struct('<I')
+NO_BASELINE = 0
+META_UNCHANGED = -1
+
+# (table, fields per entity)
+TABLES = (
+    # x, y, health, max_health, invulnerable, level, xp, xp_to_level, kills, gems, active weapon slot,
+    # then (weapon type, weapon level) for 3 weapon slots (type 0 = empty)
+    ('players', 17),
+    # x, y, type, health, max_health, size, elite
+    ('enemies', 7),
+    # x, y, size, weapon type, owner player
+    ('projectiles', 5),
+    # time, difficulty, game over, paused, upgrade menu shown, upgrade player (-1 = none)
+    ('counters', 6),
+    # enemy cap, projectile cap, distant throttling
+    ('budget', 3),
+)
+EMPTY_SNAPSHOT = {table: {} for table, _ in TABLES}
+EMPTY_SNAPSHOT['meta'] = None
+
+
+def _pack_ints(values):
+    packed = array('i', values)
+    if sys.byteorder != 'little':
+        packed.byteswap()
+    return packed.tobytes()
+
+
+def capture_snapshot(game, previous=None, phase=0, interval=1):
+    # Enemies are refreshed in interleaved slices: an enemy's row is rebuilt when
+    # id % interval == phase (or it is new), otherwise the row object from the previous
+    # snapshot is reused, so encoding can skip it with an identity check
+    players = {}
+    projectiles = {}
+    for player in game.players:
+        weapon_slots = []
+        for slot in range(3):
+            if slot < len(player.weapons):
+                weapon = player.weapons[slot]
+                weapon_slots += [weapon.type.value, weapon.level]
+            else:
+                weapon_slots += [0, 0]
+        players[player.index] = (
+            round(player.x), round(player.y), round(player.health), round(player.max_health), player.invulnerable,
+            player.level, round(player.xp), player.xp_to_level, player.kills, player.gems,
+            player.weapons.index(player.active_weapon), *weapon_slots
+        )
+
+        for weapon in player.weapons:
+            weapon_type = weapon.type.value
+            for p in weapon.projectiles:
+                projectiles[p['id']] = (round(p['x']), round(p['y']), round(p['size']), weapon_type, player.index)
+
+    previous_enemies = previous['enemies'] if previous is not None else {}
+    enemies = {}
+    for enemy in game.enemies:
+        row = previous_enemies.get(enemy.id)
+        if row is None or enemy.id % interval == phase:
+            row = (round(enemy.x), round(enemy.y), ENEMY_TYPES.index(enemy.type), round(enemy.health),
+                   round(enemy.max_health), enemy.size, int(enemy.elite))
+        enemies[enemy.id] = row
+
+    upgrade_player = game.upgrade_player.index if game.upgrade_player is not None else -1
+    counters = {0: (game.time, game.difficulty_level, int(game.game_over), int(game.paused),
+                    int(game.show_upgrade_menu), upgrade_player)}
+
+    budget = game.budget
+    budget_row = {0: (budget.enemy_cap, budget.projectile_cap, int(budget.throttle_distant))}
+
+    # Menu text only changes on level-up and policy counters at most once per frame, so both
+    # travel as JSON, which also keeps the unbounded counters out of the 32-bit tables
+    meta = {
+        'options': [[o.name, o.description, o.preview, o.rarity_name, list(o.color)] for o in game.upgrade_options],
+        'budget_counters': [budget.counters[name] for name in BUDGET_COUNTERS],
+    }
+
+    return {'players': players, 'enemies': enemies, 'projectiles': projectiles, 'counters': counters,
+            'budget': budget_row, 'meta': meta}
+
+
+def encode_snapshot(seq, snapshot, baseline_seq=NO_BASELINE, baseline=None):
+    if baseline is None:
+        baseline_seq = NO_BASELINE
+        baseline = EMPTY_SNAPSHOT
+
+    parts = [HEADER.pack(seq, baseline_seq)]
+    for table, _ in TABLES:
+        new = snapshot[table]
+        old = baseline[table]
+
+        removed = [entity_id for entity_id in old if entity_id not in new]
+        full = []
+        delta = []
+        full_count = 0
+        delta_count = 0
+        for entity_id, values in new.items():
+            previous = old.get(entity_id)
+            if previous is None:
+                full.append(entity_id)
+                full.extend(values)
+                full_count += 1
+            elif previous is not values and previous != values:
+                delta.append(entity_id)
+                delta.extend(map(sub, values, previous))
+                delta_count += 1
+
+        parts.append(COUNTS.pack(len(removed), full_count, delta_count))
+        parts.append(_pack_ints(removed + full + delta))
+
+    if baseline_seq != NO_BASELINE and snapshot['meta'] == baseline['meta']:
+        parts.append(META_LENGTH.pack(META_UNCHANGED))
+    else:
+        meta = json.dumps(snapshot['meta'], separators=(',', ':')).encode('utf-8')
+        parts.append(META_LENGTH.pack(len(meta)))
+        parts.append(meta)
+
+    body = zlib.compress(b''.join(parts), 1)
+    return FRAME.pack(len(body)) + body
+
+
+def decode_snapshot(body, baselines):
+    # baselines: seq -> snapshot the viewer has already decoded
+    raw = zlib.decompress(body)
+    seq, baseline_seq = HEADER.unpack_from(raw, 0)
+    offset = HEADER.size
+
+    if baseline_seq == NO_BASELINE:
+        baseline = EMPTY_SNAPSHOT
+    elif baseline_seq in baselines:
+        baseline = baselines[baseline_seq]
+    else:
+        raise ValueError(f"Snapshot {seq} refers to unknown baseline {baseline_seq}")
+
+    snapshot = {}
+    for table, field_count in TABLES:
+        removed_count, full_count, delta_count = COUNTS.unpack_from(raw, offset)
+        offset += COUNTS.size
+        stride = field_count + 1
+        value_count = removed_count + (full_count + delta_count) * stride
+        values = struct.unpack_from(f'<{value_count}i', raw, offset)
+        offset += value_count * 4
+
+        entities = dict(baseline[table])
+        for entity_id in values[:removed_count]:
+            del entities[entity_id]
+
+        pos = removed_count
+        for _ in range(full_count):
+            entities[values[pos]] = values[pos + 1:pos + stride]
+            pos += stride
+        for _ in range(delta_count):
+            entity_id = values[pos]
+            entities[entity_id] = tuple(p + d for p, d in zip(entities[entity_id], values[pos + 1:pos + stride]))
+            pos += stride
+        snapshot[table] = entities
+
+    (meta_length,) = META_LENGTH.unpack_from(raw, offset)
+    offset += META_LENGTH.size
+    if meta_length == META_UNCHANGED:
+        snapshot['meta'] = baseline['meta']
+    else:
+        snapshot['meta'] = json.loads(raw[offset:offset + meta_length].decode('utf-8'))
+
+    return seq, baseline_seq, snapshot
+
+
+class _Connection:
+    def __init__(self, sock):
+        self.sock = sock
+        self.sock.setblocking(False)
+        self.incoming = bytearray()
+        self.outgoing = bytearray()
+        self.connected = True
+
+    def receive(self):
+        while self.connected:
+            try:
+                data = self.sock.recv(65536)
+            except BlockingIOError:
+                break
+            except OSError:
+                self.connected = False
+                break
+            if not data:
+                self.connected = False
+                break
+            self.incoming += data
+
+    def flush(self):
+        while self.outgoing and self.connected:
+            try:
+                sent = self.sock.send(self.outgoing)
+            except BlockingIOError:
+                break
+            except OSError:
+                self.connected = False
+                break
+            del self.outgoing[:sent]
+
+    def close(self):
+        self.connected = False
+        self.sock.close()
+
+
+class _Viewer(_Connection):
+    def __init__(self, sock):
+        super().__init__(sock)
+        self.acked = NO_BASELINE
+
+    def read_acks(self):
+        self.receive()
+        whole = len(self.incoming) - len(self.incoming) % ACK.size
+        for offset in range(0, whole, ACK.size):
+            (seq,) = ACK.unpack_from(self.incoming, offset)
+            self.acked = max(self.acked, seq)
+        del self.incoming[:whole]
+
+
+class SnapshotServer:
+    # Streams game state to local viewers, delta-compressed against each viewer's last ack
+    def __init__(self, host=STREAM_HOST, port=STREAM_PORT):
+        self.listener = socket.create_server((host, port))
+        self.listener.setblocking(False)
+        self.port = self.listener.getsockname()[1]
+        self.viewers = []
+        self.history = {}  # seq -> snapshot, possible delta baselines
+        self.seq = NO_BASELINE
+
+        # Counters for monitoring bandwidth and encode cost
+        self.frames_sent = 0
+        self.bytes_sent = 0
+        self.last_encode_time = 0.0
+
+    def accept_viewers(self):
+        while True:
+            try:
+                sock, _ = self.listener.accept()
+            except BlockingIOError:
+                break
+            sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+            self.viewers.append(_Viewer(sock))
+
+    def publish(self, game):
+        self.accept_viewers()
+        for viewer in self.viewers[:]:
+            viewer.read_acks()
+            viewer.flush()
+            if not viewer.connected:
+                viewer.close()
+                self.viewers.remove(viewer)
+
+        # Nobody watching, nothing to encode
+        if not self.viewers:
+            return
+
+        start = time.perf_counter()
+        self.seq += 1
+        snapshot = capture_snapshot(game, self.history.get(self.seq - 1), self.seq % ENEMY_REFRESH_INTERVAL,
+                                    ENEMY_REFRESH_INTERVAL)
+        self.history[self.seq] = snapshot
+        self.history.pop(self.seq - SNAPSHOT_HISTORY, None)
+
+        # Viewers that acked the same snapshot share one encoded frame
+        frames = {}
+        for viewer in self.viewers:
+            # A viewer this far behind gets no new frames until it drains
+            if len(viewer.outgoing) > MAX_PENDING_BYTES:
+                continue
+
+            baseline_seq = viewer.acked if viewer.acked in self.history else NO_BASELINE
+            frame = frames.get(baseline_seq)
+            if frame is None:
+                frame = encode_snapshot(self.seq, snapshot, baseline_seq, self.history.get(baseline_seq))
+                frames[baseline_seq] = frame
+
+            viewer.outgoing += frame
+            viewer.flush()
+            self.frames_sent += 1
+            self.bytes_sent += len(frame)
+        self.last_encode_time = time.perf_counter() - start
+
+    def close(self):
+        for viewer in self.viewers:
+            viewer.close()
+        self.viewers = []
+        self.listener.close()
+
+
+class SnapshotClient(_Connection):
+    # Receives the stream and acknowledges every snapshot it decodes
+    def __init__(self, host=STREAM_HOST, port=STREAM_PORT):
+        super().__init__(socket.create_connection((host, port)))
+        self.sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        self.snapshots = {}  # seq -> decoded snapshot, possible delta baselines
+        self.last_seq = NO_BASELINE
+
+    def poll(self):
+        # Returns the newest snapshot received since the last poll, or None
+        self.receive()
+
+        latest = None
+        while len(self.incoming) >= FRAME.size:
+            (length,) = FRAME.unpack_from(self.incoming, 0)
+            if len(self.incoming) < FRAME.size + length:
+                break
+            body = bytes(self.incoming[FRAME.size:FRAME.size + length])
+            del self.incoming[:FRAME.size + length]
+
+            seq, baseline_seq, snapshot = decode_snapshot(body, self.snapshots)
+            self.snapshots[seq] = snapshot
+            # The server never goes back to a baseline older than the one it just used
+            for old_seq in [s for s in self.snapshots if s < baseline_seq]:
+                del self.snapshots[old_seq]
+
+            self.outgoing += ACK.pack(seq)
+            latest = snapshot
+            self.last_seq = seq
+
+        self.flush()
+        return latest
+
+
+class RemoteUpgradeOption:
+    def __init__(self, name, description, preview, rarity_name, color):
+        self.name = name
+        self.description = description
+        self.preview = preview
+        self.rarity_name = rarity_name
+        self.color = tuple(color)
+
+
+class SpectatorView:
+    # Mirrors streamed snapshots into a local Game so the regular draw code can render them
+    def __init__(self):
+        self.game = None
+        self.enemies = {}  # enemy id -> mirrored Enemy
+
+    def apply(self, snapshot):
+        players = snapshot['players']
+        if self.game is None or len(self.game.players) != len(players):
+            self.game = Game(len(players))
+            self.enemies = {}
+        game = self.game
+
+        # Players and their weapons
+        weapons_by_type = {}
+        for player in game.players:
+            (player.x, player.y, player.health, player.max_health, player.invulnerable, player.level, player.xp,
+             player.xp_to_level, player.kills, player.gems, active_slot, *weapon_slots) = players[player.index]
+
+            weapons = []
+            for slot in range(3):
+                weapon_type, level = weapon_slots[slot * 2], weapon_slots[slot * 2 + 1]
+                if weapon_type == 0:
+                    break
+                weapon = player.weapons[slot] if slot < len(player.weapons) else None
+                if weapon is None or weapon.type.value != weapon_type:
+                    weapon = Weapon(WeaponType(weapon_type), level)
+                elif weapon.level != level:
+                    weapon.level = level
+                    weapon.apply_level_bonuses()
+                weapon.projectiles = []
+                weapons.append(weapon)
+                weapons_by_type[(player.index, weapon_type)] = weapon
+            player.weapons = weapons
+            player.active_weapon = weapons[active_slot]
+
+        # Projectiles go back to the weapon that fired them
+        for x, y, size, weapon_type, owner in snapshot['projectiles'].values():
+            weapon = weapons_by_type.get((owner, weapon_type))
+            if weapon is not None:
+                weapon.projectiles.append({'x': x, 'y': y, 'size': size})
+
+        # Enemies, reusing mirrors that survive between snapshots
+        enemies = {}
+        for enemy_id, (x, y, enemy_type, health, max_health, size, elite) in snapshot['enemies'].items():
+            enemy = self.enemies.get(enemy_id)
+            if enemy is None:
+                enemy = Enemy(x, y, ENEMY_TYPES[enemy_type])
+            enemy.x, enemy.y, enemy.health, enemy.max_health, enemy.size = x, y, health, max_health, size
+            enemy.elite = bool(elite)
+            enemies[enemy_id] = enemy
+        self.enemies = enemies
+        game.enemies = list(enemies.values())
+
+        # HUD counters and upgrade menu
+        time_frames, difficulty_level, game_over, paused, show_upgrade_menu, upgrade_player = snapshot['counters'][0]
+        game.time = time_frames
+        game.difficulty_level = difficulty_level
+        game.game_over = bool(game_over)
+        game.paused = bool(paused)
+        game.show_upgrade_menu = bool(show_upgrade_menu)
+        game.upgrade_player = game.players[upgrade_player] if upgrade_player >= 0 else None
+        game.upgrade_options = [RemoteUpgradeOption(*option) for option in snapshot['meta']['options']]
+
+        # Degradation state and counters of the streamed session
+        game.budget.enemy_cap, game.budget.projectile_cap, throttle_distant = snapshot['budget'][0]
+        game.budget.throttle_distant = bool(throttle_distant)
+        game.budget.counters = dict(zip(BUDGET_COUNTERS, snapshot['meta']['budget_counters']))
+        return game
+
+
+def loopback_check(num_players=4, max_ticks=20000, timeout=5.0):
+    # Plays a full headless game, streams it over loopback and checks that every decoded
+    # snapshot matches what the server captured
+    os.environ.setdefault('SDL_VIDEODRIVER', 'dummy')
+    pygame.init()
+    pygame.display.set_mode((1, 1))
+
+    server = SnapshotServer('127.0.0.1', 0)
+    client = SnapshotClient('127.0.0.1', server.port)
+    view = SpectatorView()
+    game = Game(num_players)
+    try:
+        for _ in range(max_ticks):
+            game.update()
+            if game.show_upgrade_menu:
+                game.apply_upgrade(game.upgrade_options[0])
+            server.publish(game)
+
+            deadline = time.monotonic() + timeout
+            while client.last_seq < server.seq:
+                snapshot = client.poll()
+                if snapshot is not None:
+                    if snapshot != server.history[client.last_seq]:
+                        raise RuntimeError(f"Snapshot {client.last_seq} decoded differently from what was sent")
+                    view.apply(snapshot)
+                elif time.monotonic() > deadline:
+                    raise RuntimeError(f"Timed out waiting for snapshot {server.seq}")
+            if game.game_over:
+                break
+        if not game.game_over:
+            raise RuntimeError(f"Game still running after {max_ticks} ticks")
+        return server.seq, server.bytes_sent
+    finally:
+        client.close()
+        server.close()
+
+
+if __name__ == "__main__":
+    ticks, sent = loopback_check()
+    print(f"Loopback check passed: {ticks} snapshots, {sent / ticks:.0f} bytes per tick")
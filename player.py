@@ -1,16 +1,26 @@
+from collections import deque
+
 import pygame
-from constants import SCREEN_WIDTH, SCREEN_HEIGHT, PLAYER_SPEED, WHITE, RED, GREEN, EACH_NUM_LEVEL_UP_UPGRADE_STUFF, \
-    XP_TO_LEVEL
+from constants import SCREEN_WIDTH, SCREEN_HEIGHT, PLAYER_SPEED, RED, GREEN, EACH_NUM_LEVEL_UP_UPGRADE_STUFF, \
+    XP_TO_LEVEL, MAX_SPEED_LEVEL, PLAYER_COLORS
+from controls import build_player_controls
 from weapon import Weapon, WeaponType
 
+# Precomputed movement speed per speed upgrade level (+15% each)
+SPEED_LEVELS = [PLAYER_SPEED * 1.15 ** level for level in range(MAX_SPEED_LEVEL + 1)]
+
 
 class Player:
-    def __init__(self):
-        self.x = SCREEN_WIDTH // 2
+    def __init__(self, index=0, controls=None, num_players=1):
+        self.index = index
+        self.controls = controls if controls is not None else build_player_controls(1)[0]
+        # Spread co-op players horizontally around the center
+        self.x = SCREEN_WIDTH // 2 + int((index - (num_players - 1) / 2) * 60)
         self.y = SCREEN_HEIGHT // 2
         self.size = 20
-        self.color = WHITE
-        self.speed = PLAYER_SPEED
+        self.color = PLAYER_COLORS[index]
+        self.speed_level = 0
+        self.speed = SPEED_LEVELS[self.speed_level]
         self.weapons = [Weapon(WeaponType.KNIFE), Weapon(WeaponType.AXE), Weapon(WeaponType.MAGIC)]
         self.max_health = 100
         self.active_weapon = self.weapons[0]
@@ -21,17 +31,17 @@ class Player:
         self.kills = 0
         self.gems = 0
         self.invulnerable = 0  # Invulnerability frames
+        self.upgrade_queue = deque()  # Levels reached whose upgrade has not been picked yet
+
+    @property
+    def alive(self):
+        return self.health > 0
 
     def update(self, keys, enemies):
         # Movement
-        if keys[pygame.K_w] or keys[pygame.K_UP]:
-            self.y = max(self.y - self.speed, self.size)
-        if keys[pygame.K_s] or keys[pygame.K_DOWN]:
-            self.y = min(self.y + self.speed, SCREEN_HEIGHT - self.size)
-        if keys[pygame.K_a] or keys[pygame.K_LEFT]:
-            self.x = max(self.x - self.speed, self.size)
-        if keys[pygame.K_d] or keys[pygame.K_RIGHT]:
-            self.x = min(self.x + self.speed, SCREEN_WIDTH - self.size)
+        dx, dy = self.controls.movement(keys)
+        self.x = min(max(self.x + dx * self.speed, self.size), SCREEN_WIDTH - self.size)
+        self.y = min(max(self.y + dy * self.speed, self.size), SCREEN_HEIGHT - self.size)
 
         # Weapon updates and attacks
         for weapon in self.weapons:
@@ -39,7 +49,7 @@ class Player:
             if weapon == self.active_weapon and weapon.can_attack():
                 weapon.attack(self.x, self.y, enemies)
             weapon.update_projectiles()
-            weapon.check_collisions(enemies)
+            weapon.check_collisions(enemies, self)
 
         # Update invulnerability frames
         if self.invulnerable > 0:
@@ -1,5 +1,5 @@
 import pygame
-from constants import WHITE, BLACK, BLUE, RED, GOLD, SCREEN_WIDTH, SCREEN_HEIGHT, FPS
+from constants import WHITE, BLACK, BLUE, RED, GOLD, GREEN, SCREEN_WIDTH, SCREEN_HEIGHT, FPS
 
 class UI:
     def __init__(self, game):
@@ -8,44 +8,65 @@ class UI:
         self.large_font = pygame.font.SysFont(None, 48)
     
     def draw_ui(self, screen):
-        # XP bar
+        players = self.game.players
+        solo = len(players) == 1
+
+        # XP bars, one per player
         xp_bar_width = SCREEN_WIDTH - 20
-        xp_bar_height = 10
+        xp_bar_height = 10 if solo else 6
         xp_bar_x = 10
-        xp_bar_y = 10
-
-        # Background (empty XP)
-        pygame.draw.rect(screen, WHITE, (xp_bar_x, xp_bar_y, xp_bar_width, xp_bar_height))
-        # Foreground (current XP)
-        current_xp_width = int((self.game.player.xp / self.game.player.xp_to_level) * xp_bar_width)
-        pygame.draw.rect(screen, BLUE, (xp_bar_x, xp_bar_y, current_xp_width, xp_bar_height))
-
-        # Level text
-        level_text = self.font.render(f"Level: {self.game.player.level}", True, WHITE)
-        screen.blit(level_text, (10, 25))
-
-        # Kills text
-        kills_text = self.font.render(f"Kills: {self.game.player.kills}", True, WHITE)
-        screen.blit(kills_text, (10, 45))
-
-        # Gems text
-        gems_text = self.font.render(f"Gems: {self.game.player.gems}", True, GOLD)
-        screen.blit(gems_text, (10, 65))
+        for i, player in enumerate(players):
+            xp_bar_y = 10 + i * (xp_bar_height + 2)
+
+            # Background (empty XP)
+            pygame.draw.rect(screen, WHITE, (xp_bar_x, xp_bar_y, xp_bar_width, xp_bar_height))
+            # Foreground (current XP)
+            current_xp_width = int((player.xp / player.xp_to_level) * xp_bar_width)
+            pygame.draw.rect(screen, BLUE if solo else player.color, (xp_bar_x, xp_bar_y, current_xp_width, xp_bar_height))
+        text_y = 13 + len(players) * (xp_bar_height + 2)
+
+        if solo:
+            player = players[0]
+
+            # Level text
+            level_text = self.font.render(f"Level: {player.level}", True, WHITE)
+            screen.blit(level_text, (10, text_y))
+
+            # Kills text
+            kills_text = self.font.render(f"Kills: {player.kills}", True, WHITE)
+            screen.blit(kills_text, (10, text_y + 20))
+
+            # Gems text
+            gems_text = self.font.render(f"Gems: {player.gems}", True, GOLD)
+            screen.blit(gems_text, (10, text_y + 40))
+        else:
+            # One summary line per player
+            for i, player in enumerate(players):
+                status = f"Lv{player.level}  Kills: {player.kills}  Gems: {player.gems}" if player.alive else "DOWN"
+                player_text = self.font.render(f"P{player.index + 1}  {status}", True, player.color)
+                screen.blit(player_text, (10, text_y + i * 20))
 
         # Time text (convert frames to seconds)
         time_seconds = self.game.time // FPS
         minutes = time_seconds // 60
         seconds = time_seconds % 60
         time_text = self.font.render(f"Time: {minutes:02d}:{seconds:02d}", True, WHITE)
-        screen.blit(time_text, (SCREEN_WIDTH - 120, 25))
+        screen.blit(time_text, (SCREEN_WIDTH - 120, text_y))
 
         # Weapon info
-        weapons_text = self.font.render("Weapons:", True, WHITE)
-        screen.blit(weapons_text, (SCREEN_WIDTH - 120, 45))
-
-        for i, weapon in enumerate(self.game.player.weapons):
-            weapon_text = self.font.render(f"{weapon.type.name} Lv{weapon.level}", True, WHITE)
-            screen.blit(weapon_text, (SCREEN_WIDTH - 120, 65 + i * 20))
+        if solo:
+            weapons_text = self.font.render("Weapons:", True, WHITE)
+            screen.blit(weapons_text, (SCREEN_WIDTH - 120, text_y + 20))
+
+            for i, weapon in enumerate(players[0].weapons):
+                weapon_text = self.font.render(f"{weapon.type.name} Lv{weapon.level}", True, WHITE)
+                screen.blit(weapon_text, (SCREEN_WIDTH - 120, text_y + 40 + i * 20))
+        else:
+            # Active weapon per player
+            for i, player in enumerate(players):
+                weapon = player.active_weapon
+                weapon_text = self.font.render(f"P{player.index + 1} {weapon.type.name} Lv{weapon.level}", True, player.color)
+                screen.blit(weapon_text, (SCREEN_WIDTH - 160, text_y + 20 + i * 20))
 
     def draw_game_over(self, screen):
         # Semi-transparent overlay
@@ -58,10 +79,11 @@ class UI:
         screen.blit(game_over_text, (SCREEN_WIDTH // 2 - game_over_text.get_width() // 2, SCREEN_HEIGHT // 3))
 
         # Stats
+        players = self.game.players
         stats = [
-            f"Level Reached: {self.game.player.level}",
-            f"Enemies Defeated: {self.game.player.kills}",
-            f"Gems Collected: {self.game.player.gems}",
+            f"Level Reached: {max(p.level for p in players)}",
+            f"Enemies Defeated: {sum(p.kills for p in players)}",
+            f"Gems Collected: {sum(p.gems for p in players)}",
             f"Time Survived: {self.game.time//FPS//60:02d}:{self.game.time//FPS%60:02d}"
         ]
 
@@ -80,32 +102,39 @@ class UI:
         screen.blit(overlay, (0, 0))
 
         # Level up text
-        level_up_text = self.large_font.render(f"Level Up! - Level {self.game.player.level}", True, GOLD)
+        player = self.game.upgrade_player
+        title = f"Level Up! - Level {player.level}"
+        if len(self.game.players) > 1:
+            title = f"Player {player.index + 1} {title}"
+        level_up_text = self.large_font.render(title, True, GOLD)
         screen.blit(level_up_text, (SCREEN_WIDTH // 2 - level_up_text.get_width() // 2, 50))
 
         # Choose upgrade text
-        choose_text = self.font.render("Choose an upgrade (press 1, 2, or 3):", True, WHITE)
+        labels = player.controls.choice_labels
+        choose_text = self.font.render(f"Choose an upgrade (press {labels[0]}, {labels[1]}, or {labels[2]}):", True, WHITE)
         screen.blit(choose_text, (SCREEN_WIDTH // 2 - choose_text.get_width() // 2, 100))
 
         # Draw options
         for i, option in enumerate(self.game.upgrade_options):
             # Option box
             box_width = 600
-            box_height = 80
+            box_height = 90
             box_x = SCREEN_WIDTH // 2 - box_width // 2
             box_y = 150 + i * (box_height + 20)
 
-            # Draw box
-            pygame.draw.rect(screen, WHITE, (box_x, box_y, box_width, box_height))
+            # Draw box (border tinted by rarity)
+            pygame.draw.rect(screen, option.color, (box_x, box_y, box_width, box_height))
             pygame.draw.rect(screen, BLACK, (box_x + 2, box_y + 2, box_width - 4, box_height - 4))
 
             # Option text
-            name_text = self.font.render(option['name'], True, GOLD)
-            desc_text = self.font.render(option['description'], True, WHITE)
+            name_text = self.font.render(f"{option.name} ({option.rarity_name})", True, GOLD)
+            desc_text = self.font.render(option.description, True, WHITE)
+            preview_text = self.font.render(option.preview, True, GREEN)
 
-            screen.blit(name_text, (box_x + 20, box_y + 15))
-            screen.blit(desc_text, (box_x + 20, box_y + 45))
+            screen.blit(name_text, (box_x + 20, box_y + 10))
+            screen.blit(desc_text, (box_x + 20, box_y + 37))
+            screen.blit(preview_text, (box_x + 20, box_y + 64))
 
             # Draw selection number
-            key_text = self.large_font.render(str(i + 1), True, WHITE)
-            screen.blit(key_text, (box_x + box_width - 30, box_y + box_height // 2 - key_text.get_height() // 2))
+            key_text = self.large_font.render(labels[i], True, WHITE)
+            screen.blit(key_text, (box_x + box_width - 10 - key_text.get_width(), box_y + box_height // 2 - key_text.get_height() // 2))
@@ -0,0 +1,148 @@
+import random
+
+from constants import WeaponType, MAX_WEAPON_LEVEL, MAX_SPEED_LEVEL, UPGRADE_CHOICES, RARITY_COMMON, RARITY_RARE, \
+    RARITY_EPIC
+from player import SPEED_LEVELS
+from weapon import Weapon
+
+HEALTH_UPGRADE_AMOUNT = 25
+
+
+class UpgradeKind:
+    def __init__(self, key, weight, rarity, targets, name, description, preview, apply):
+        self.key = key
+        self.weight = weight
+        self.rarity = rarity
+        # targets(player) -> list of targets this upgrade can currently apply to (prerequisites)
+        self.targets = targets
+        self.name = name
+        self.description = description
+        # preview(player, target) -> list of (label, before, after)
+        self.preview = preview
+        self.apply = apply
+
+
+class UpgradeOption:
+    def __init__(self, kind, target, player):
+        self.kind = kind
+        self.target = target
+        self.rarity_name, self.color = kind.rarity
+        # Text is formatted once when the option is rolled, not every frame
+        self.name = kind.name(target)
+        self.description = kind.description(target)
+        self.preview = "   ".join(f"{label}: {before} -> {after}" for label, before, after in kind.preview(player, target))
+
+    def apply(self, player):
+        self.kind.apply(player, self.target)
+
+
+# Upgrade effects and previews
+def _weapon_preview(weapon, levels):
+    before = Weapon.stats_for(weapon.type, weapon.level)
+    after = Weapon.stats_for(weapon.type, weapon.level + levels)
+    return [
+        ("Lv", weapon.level, weapon.level + levels),
+        ("DMG", before['damage'], after['damage']),
+        ("PEN", before['penetration'], after['penetration']),
+        ("CD", before['base_cooldown'], after['base_cooldown']),
+    ]
+
+
+def _upgrade_weapon(weapon, levels):
+    weapon.level = min(weapon.level + levels, MAX_WEAPON_LEVEL)
+    weapon.apply_level_bonuses()
+
+
+def _upgrade_health(player):
+    player.max_health += HEALTH_UPGRADE_AMOUNT
+    player.health = player.max_health
+
+
+def _upgrade_speed(player):
+    player.speed_level = min(player.speed_level + 1, MAX_SPEED_LEVEL)
+    player.speed = SPEED_LEVELS[player.speed_level]
+
+
+def _missing_weapon_types(player):
+    current_weapon_types = [w.type for w in player.weapons]
+    if len(player.weapons) >= 3:
+        return []
+    return [w for w in WeaponType if w not in current_weapon_types]
+
+
+UPGRADE_KINDS = [
+    UpgradeKind(
+        key='new_weapon',
+        weight=3,
+        rarity=RARITY_RARE,
+        targets=_missing_weapon_types,
+        name=lambda weapon_type: f"New Weapon: {weapon_type.name}",
+        description=lambda weapon_type: f"Add a new {weapon_type.name.lower()} weapon to your arsenal.",
+        preview=lambda player, weapon_type: [("Weapons", len(player.weapons), len(player.weapons) + 1)],
+        apply=lambda player, weapon_type: player.weapons.append(Weapon(weapon_type)),
+    ),
+    UpgradeKind(
+        key='upgrade_weapon',
+        weight=4,
+        rarity=RARITY_COMMON,
+        targets=lambda player: [w for w in player.weapons if w.level < MAX_WEAPON_LEVEL],
+        name=lambda weapon: f"Upgrade {weapon.type.name}",
+        description=lambda weapon: f"Increase damage, penetration and reduce cooldown of your {weapon.type.name.lower()}.",
+        preview=lambda player, weapon: _weapon_preview(weapon, 1),
+        apply=lambda player, weapon: _upgrade_weapon(weapon, 1),
+    ),
+    UpgradeKind(
+        key='weapon_surge',
+        weight=1,
+        rarity=RARITY_EPIC,
+        targets=lambda player: [w for w in player.weapons if w.level <= MAX_WEAPON_LEVEL - 2],
+        name=lambda weapon: f"Surge: {weapon.type.name}",
+        description=lambda weapon: f"Your {weapon.type.name.lower()} gains two levels at once.",
+        preview=lambda player, weapon: _weapon_preview(weapon, 2),
+        apply=lambda player, weapon: _upgrade_weapon(weapon, 2),
+    ),
+    UpgradeKind(
+        key='health_upgrade',
+        weight=2,
+        rarity=RARITY_COMMON,
+        targets=lambda player: [None],
+        name=lambda target: "Health Boost",
+        description=lambda target: f"Increase max health by {HEALTH_UPGRADE_AMOUNT} and fully heal.",
+        preview=lambda player, target: [
+            ("Max HP", player.max_health, player.max_health + HEALTH_UPGRADE_AMOUNT),
+            ("HP", player.health, player.max_health + HEALTH_UPGRADE_AMOUNT),
+        ],
+        apply=lambda player, target: _upgrade_health(player),
+    ),
+    UpgradeKind(
+        key='speed_upgrade',
+        weight=2,
+        rarity=RARITY_COMMON,
+        targets=lambda player: [None] if player.speed_level < MAX_SPEED_LEVEL else [],
+        name=lambda target: "Movement Speed",
+        description=lambda target: "Increase movement speed by 15%.",
+        preview=lambda player, target: [
+            ("Speed", f"{SPEED_LEVELS[player.speed_level]:.2f}", f"{SPEED_LEVELS[player.speed_level + 1]:.2f}"),
+        ],
+        apply=lambda player, target: _upgrade_speed(player),
+    ),
+]
+
+
+def roll_upgrade_options(player, count=UPGRADE_CHOICES, rng=random):
+    # Every (kind, target) pair that passes its prerequisites is a candidate
+    candidates = []
+    weights = []
+    for kind in UPGRADE_KINDS:
+        for target in kind.targets(player):
+            candidates.append((kind, target))
+            weights.append(kind.weight)
+
+    # Weighted sampling without replacement
+    options = []
+    while candidates and len(options) < count:
+        index = rng.choices(range(len(candidates)), weights=weights)[0]
+        kind, target = candidates.pop(index)
+        weights.pop(index)
+        options.append(UpgradeOption(kind, target, player))
+    return options
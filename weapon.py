@@ -1,7 +1,40 @@
+import itertools
 import pygame
 import random
 import math
-from constants import WeaponType, WHITE, RED, GOLD, SCREEN_WIDTH, SCREEN_HEIGHT
+from constants import WeaponType, WHITE, RED, GOLD, SCREEN_WIDTH, SCREEN_HEIGHT, MAX_WEAPON_LEVEL
+
+# Stable ids so projectiles can be tracked across frames (e.g. for network snapshots)
+_projectile_ids = itertools.count(1)
+
+# Base stats per weapon type (level 1)
+WEAPON_BASE_STATS = {
+    WeaponType.KNIFE: {'base_cooldown': 30, 'damage': 10, 'speed': 8, 'penetration': 1, 'size': 10},
+    WeaponType.AXE: {'base_cooldown': 90, 'damage': 30, 'speed': 6, 'penetration': 2, 'size': 15},
+    WeaponType.MAGIC: {'base_cooldown': 60, 'damage': 20, 'speed': 5, 'penetration': 3, 'size': 20},
+}
+
+
+def weapon_stats_for_level(weapon_type, level):
+    # Every level is derived from the base stats, never from the previous level,
+    # so repeated upgrades cannot compound rounding errors
+    base = WEAPON_BASE_STATS[weapon_type]
+    level_bonus = (level - 1) * 0.2  # 20% increase per level
+    return {
+        'base_cooldown': max(10, int(base['base_cooldown'] * (1 - level_bonus * 0.5))),
+        'damage': int(base['damage'] * (1 + level_bonus)),
+        'speed': base['speed'],
+        'penetration': base['penetration'] + (level - 1) // 2,
+        'size': base['size'] + (level - 1) * 2,
+    }
+
+
+# Precomputed stats for every reachable level, indexed by level (index 0 unused)
+WEAPON_LEVEL_STATS = {
+    weapon_type: [None] + [weapon_stats_for_level(weapon_type, level) for level in range(1, MAX_WEAPON_LEVEL + 1)]
+    for weapon_type in WeaponType
+}
+
 
 class Weapon:
     def __init__(self, weapon_type, level=1):
@@ -10,36 +43,20 @@ class Weapon:
         self.cooldown = 0
         self.projectiles = []
 
-        # Set properties based on weapon type
-        if weapon_type == WeaponType.KNIFE:
-            self.base_cooldown = 30
-            self.damage = 10
-            self.speed = 8
-            self.penetration = 1
-            self.size = 10
-        elif weapon_type == WeaponType.AXE:
-            self.base_cooldown = 90
-            self.damage = 30
-            self.speed = 6
-            self.penetration = 2
-            self.size = 15
-        elif weapon_type == WeaponType.MAGIC:
-            self.base_cooldown = 60
-            self.damage = 20
-            self.speed = 5
-            self.penetration = 3
-            self.size = 20
-
-        # Apply level bonuses
-        if level > 1:
-            self.apply_level_bonuses()
+        # Set properties based on weapon type and level
+        self.apply_level_bonuses()
+
+    @staticmethod
+    def stats_for(weapon_type, level):
+        return WEAPON_LEVEL_STATS[weapon_type][min(level, MAX_WEAPON_LEVEL)]
 
     def apply_level_bonuses(self):
-        level_bonus = (self.level - 1) * 0.2  # 20% increase per level
-        self.damage = int(self.damage * (1 + level_bonus))
-        self.penetration += int((self.level - 1) / 2)
-        self.base_cooldown = max(10, int(self.base_cooldown * (1 - level_bonus * 0.5)))
-        self.size += int((self.level - 1) * 2)
+        stats = self.stats_for(self.type, self.level)
+        self.base_cooldown = stats['base_cooldown']
+        self.damage = stats['damage']
+        self.speed = stats['speed']
+        self.penetration = stats['penetration']
+        self.size = stats['size']
 
     def update(self):
         if self.cooldown > 0:
@@ -48,6 +65,19 @@ class Weapon:
     def can_attack(self):
         return self.cooldown <= 0
 
+    def spawn_projectile(self, x, y, angle):
+        self.projectiles.append({
+            'id': next(_projectile_ids),
+            'x': x,
+            'y': y,
+            'dx': math.cos(angle) * self.speed,
+            'dy': math.sin(angle) * self.speed,
+            'damage': self.damage,
+            'penetration': self.penetration,
+            'size': self.size,
+            'hits': []
+        })
+
     def attack(self, x, y, target_enemies):
         self.cooldown = self.base_cooldown
 
@@ -67,43 +97,16 @@ class Weapon:
                 dy = closest_enemy.y - y
                 angle = math.atan2(dy, dx)
 
-                self.projectiles.append({
-                    'x': x,
-                    'y': y,
-                    'dx': math.cos(angle) * self.speed,
-                    'dy': math.sin(angle) * self.speed,
-                    'damage': self.damage,
-                    'penetration': self.penetration,
-                    'size': self.size,
-                    'hits': []
-                })
+                self.spawn_projectile(x, y, angle)
             # Fallback if no enemies
             elif len(self.projectiles) < 10:  # Limit number of projectiles
                 angle = random.uniform(0, 2 * math.pi)
-                self.projectiles.append({
-                    'x': x,
-                    'y': y,
-                    'dx': math.cos(angle) * self.speed,
-                    'dy': math.sin(angle) * self.speed,
-                    'damage': self.damage,
-                    'penetration': self.penetration,
-                    'size': self.size,
-                    'hits': []
-                })
+                self.spawn_projectile(x, y, angle)
 
         elif self.type == WeaponType.AXE:
             # Throw in 4 directions
             for angle in [0, math.pi / 2, math.pi, 3 * math.pi / 2]:
-                self.projectiles.append({
-                    'x': x,
-                    'y': y,
-                    'dx': math.cos(angle) * self.speed,
-                    'dy': math.sin(angle) * self.speed,
-                    'damage': self.damage,
-                    'penetration': self.penetration,
-                    'size': self.size,
-                    'hits': []
-                })
+                self.spawn_projectile(x, y, angle)
 
         elif self.type == WeaponType.MAGIC:
             # Create projectiles in a circle
@@ -112,16 +115,7 @@ class Weapon:
 
             for i in range(num_projectiles):
                 angle = i * angle_step
-                self.projectiles.append({
-                    'x': x,
-                    'y': y,
-                    'dx': math.cos(angle) * self.speed,
-                    'dy': math.sin(angle) * self.speed,
-                    'damage': self.damage,
-                    'penetration': self.penetration,
-                    'size': self.size,
-                    'hits': []
-                })
+                self.spawn_projectile(x, y, angle)
 
     def draw_projectiles(self, screen):
         for p in self.projectiles:
@@ -146,7 +140,7 @@ class Weapon:
                 if p in self.projectiles:
                     self.projectiles.remove(p)
 
-    def check_collisions(self, enemies):
+    def check_collisions(self, enemies, owner=None):
         for p in self.projectiles[:]:
             for enemy in enemies:
                 if enemy not in p['hits']:  # Check if we already hit this enemy
@@ -156,6 +150,7 @@ class Weapon:
 
                     if distance < (p['size'] / 2 + enemy.size / 2):
                         enemy.take_damage(p['damage'])
+                        enemy.last_hit_by = owner
                         p['hits'].append(enemy)
 
                         # Remove projectile if penetration limit reached